@@ -1,12 +1,5 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-def render_header_table(headers: dict) -> str:
-    if not headers:
-        return '<div class="td" style="color:var(--muted)">None</div>'
-    rows = [f'<tr><th>Header</th><th>Value</th></tr>']
-    for k, v in headers.items():
-        rows.append(f'<tr><td>{html.escape(str(k))}</td><td style="word-break:break-word">{html.escape(str(v))}</td></tr>')
-    return '<table class="header-table">' + ''.join(rows) + '</table>'
 """
 Advanced HAR Comparison Tool
 - Robust request pairing (endpoint + method + parameters). GraphQL pairs by operationName + normalized query
@@ -14,21 +7,44 @@ Advanced HAR Comparison Tool
 - Light theme UI with: Tabs (Added/Removed, Changed), domain checkbox filtering (persistent), search box (live),
   detailed rows with headers and GraphQL details, and GraphQL query name in brackets for identification
 
-Standard library only.
+Standard library only; orjson is used for JSON parsing/canonicalization and ijson for streaming HAR
+entries when they are installed.
 """
 import argparse
 import difflib
+import gzip
+import hashlib
 import json
 import html
 import os
+import re
 import sqlite3
-from typing import Any, Dict, List, Tuple, Optional
-from urllib.parse import urlparse, parse_qsl
+from typing import Any, Dict, Iterator, List, Tuple, Optional, TextIO
+from urllib.parse import urlparse, urlsplit, parse_qsl
 from collections import defaultdict
+from functools import lru_cache, partial
+from itertools import chain
+from sys import intern
+from concurrent.futures import ProcessPoolExecutor
 from time import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # ----------------------------- Utilities -----------------------------
 
+# Shared compact encoders; json.dumps builds a fresh JSONEncoder whenever it is given options
+JSON_ENCODE = json.JSONEncoder(separators=(",", ":")).encode
+JSON_ENCODE_SORTED = json.JSONEncoder(separators=(",", ":"), sort_keys=True).encode
+
+
 def safe_get(d: Dict, *keys, default=None):
     for k in keys:
         if isinstance(d, dict) and k in d:
@@ -39,35 +55,68 @@ def safe_get(d: Dict, *keys, default=None):
 
 
 def list_to_kv_map(items: List[Dict[str, Any]]) -> Dict[str, str]:
-    out: Dict[str, str] = {}
-    for it in items or []:
-        n = it.get("name", "").lower()
-        v = it.get("value", "")
-        if n:
-            out[n] = v
-    return out
+    # Header names are case-insensitive; later duplicates win. Names repeat across every entry, so they are
+    # interned to share one string object per HAR, which saves memory and keeps the pickled worker results
+    # small. Maps from different workers do not share objects, so lookups across them still compare by value
+    return {intern(it["name"].lower()): it.get("value", "") for it in items or () if it.get("name")}
 
 
-def normalize_url(u: str) -> Tuple[str, str, str]:
+# URLs repeat heavily within a HAR, so URL-derived values are cached per distinct string
+@lru_cache(maxsize=8192)
+def normalize_url(u: str) -> Tuple[str, str, str, str]:
+    # Returns (url without query, host, path, raw query) from a single split
     try:
-        p = urlparse(u)
-        host = (p.netloc or "").lower()
+        p = urlsplit(u)
+        host = intern((p.netloc or "").lower())
         path = p.path or "/"
-        return f"{p.scheme}://{host}{path}", host, path
+        if ";" in path:
+            # urlparse strips ;params from the last segment; keep endpoints identical to that
+            path = urlparse(u).path or "/"
+        return f"{p.scheme}://{host}{path}", host, path, p.query
     except Exception:
-        return u, "", u
+        return u, "", u, ""
+
+
+def json_loads(s: Any) -> Any:
+    # orjson rejects a few inputs the stdlib tolerates (NaN, lone surrogates), so fall back on error
+    if orjson is not None:
+        try:
+            return orjson.loads(s)
+        except ValueError:
+            pass
+    return json.loads(s)
+
+
+def json_dumps_compact(obj: Any) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except TypeError:
+            pass
+    return JSON_ENCODE(obj)
+
+
+def json_dumps_canonical(obj: Any) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode("utf-8")
+        except TypeError:
+            pass
+    return JSON_ENCODE_SORTED(obj)
 
 
 def canonicalize_json_str(s: Any) -> str:
     if s is None or s == "":
         return ""
     try:
-        obj = s if isinstance(s, (dict, list)) else json.loads(s)
-        return json.dumps(obj, sort_keys=True, separators=(",", ":"))
+        obj = s if isinstance(s, (dict, list)) else json_loads(s)
+        return json_dumps_canonical(obj)
     except Exception:
         return str(s)
 
 
+# The same operation is typically sent many times per HAR, so normalized queries are cached by raw text
+@lru_cache(maxsize=4096)
 def normalize_graphql_query(q: Optional[str]) -> str:
     if not q:
         return ""
@@ -75,101 +124,182 @@ def normalize_graphql_query(q: Optional[str]) -> str:
     return "".join(q.split())
 
 
-def query_params_signature(url: str) -> str:
+@lru_cache(maxsize=8192)
+def query_params_signature(query: str) -> str:
     try:
-        p = urlparse(url)
-        pairs = parse_qsl(p.query, keep_blank_values=True)
+        pairs = parse_qsl(query, keep_blank_values=True)
         pairs.sort()
-        return json.dumps(pairs, separators=(",", ":"))
+        return json_dumps_compact(pairs)
     except Exception:
         return ""
 
 
 # ----------------------------- HAR loading -----------------------------
 
-def detect_graphql(req: Dict[str, Any]) -> bool:
-    mime = safe_get(req, "postData", "mimeType") or ""
-    if "graphql" in (mime or "").lower():
-        return True
-    # Heuristic: JSON body with keys query/operationName
+def parse_json_object(txt: Any) -> Optional[Dict[str, Any]]:
+    try:
+        obj = json_loads(txt)
+    except Exception:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def may_be_graphql_body(txt: Any) -> bool:
+    # Cheap substring gate so ordinary bodies are never handed to the JSON parser
     try:
-        txt = safe_get(req, "postData", "text")
-        if not txt:
-            return False
-        obj = json.loads(txt)
-        return isinstance(obj, dict) and ("query" in obj or "operationName" in obj)
+        return txt.lstrip().startswith("{") and ('"query"' in txt or '"operationName"' in txt)
     except Exception:
         return False
 
 
-def load_har(path: str) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    entries = safe_get(data, "log", "entries", default=[]) or []
-    out: List[Dict[str, Any]] = []
-    for e in entries:
-        req = e.get("request", {})
-        res = e.get("response", {})
-        method = req.get("method", "GET")
-        url = req.get("url", "")
-        url_no_q, domain, endpoint = normalize_url(url)
-        status = res.get("status")
-        time_ms = e.get("time")
-        req_headers = list_to_kv_map(req.get("headers"))
-        res_headers = list_to_kv_map(res.get("headers"))
-        req_body_text = safe_get(req, "postData", "text")
-        res_body_text = safe_get(res, "content", "text")
-        started = safe_get(e, "startedDateTime")
-
-        item: Dict[str, Any] = {
-            "type": "graphql" if detect_graphql(req) else "rest",
-            "method": method,
-            "url": url,
-            "url_no_q": url_no_q,
-            "domain": domain,
-            "endpoint": endpoint,
-            "status": status,
-            "time": time_ms,
-            "req_headers": req_headers,
-            "res_headers": res_headers,
-            "req_body": req_body_text,
-            "res_body": res_body_text,
-            "started_at": started,
-        }
-        # parameters signature for REST (query + JSON body if applicable)
-        if item["type"] == "rest":
-            params_sig = query_params_signature(url)
-            json_body_sig = ""
-            mime = (safe_get(req, "postData", "mimeType") or "").lower()
-            if mime.startswith("application/json") and req_body_text:
-                json_body_sig = canonicalize_json_str(req_body_text)
-            item["param_signature"] = json.dumps({"query": params_sig, "json": json_body_sig}, sort_keys=True)
-        else:
-            # GraphQL fields
-            gql_op = None
-            gql_query_raw = None
-            gql_vars = None
-            if req_body_text:
-                try:
-                    pd = json.loads(req_body_text)
-                    if isinstance(pd, dict):
-                        gql_op = pd.get("operationName")
-                        gql_query_raw = pd.get("query")
-                        gql_vars = pd.get("variables")
-                except Exception:
-                    pass
-            item["gql_operation"] = gql_op
-            item["gql_query"] = gql_query_raw
-            item["gql_query_norm"] = normalize_graphql_query(gql_query_raw)
-            item["gql_variables"] = gql_vars
-        out.append(item)
-    return out
+def detect_graphql(mime: str, body: Optional[Dict[str, Any]]) -> bool:
+    if "graphql" in mime:
+        return True
+    # Heuristic: JSON body with keys query/operationName
+    return body is not None and ("query" in body or "operationName" in body)
+
+
+# URL fragments and response MIME types that mark an entry as an API call rather than a page asset
+API_URL_RE = re.compile(r"/api/|/graphql|/v[123]/|/rest/|\.json|/json|/ajax", re.IGNORECASE)
+API_MIME_TYPES = frozenset({
+    "application/json", "application/graphql", "application/graphql+json", "application/graphql-response+json",
+    "application/xml", "text/xml",
+})
+
+
+def is_api_or_graphql(url: str, mime: Optional[str]) -> bool:
+    if API_URL_RE.search(url):
+        return True
+    return bool(mime) and mime.split(";", 1)[0].strip().lower() in API_MIME_TYPES
+
+
+def is_api_entry(e: Dict[str, Any]) -> bool:
+    req = e.get("request", {})
+    content = e.get("response", {}).get("content")
+    mime = content.get("mimeType") if isinstance(content, dict) else None
+    if is_api_or_graphql(req.get("url", ""), mime):
+        return True
+    # GraphQL can be served from any path with any response type; keep what build_item would detect as GraphQL
+    post = req.get("postData")
+    if not isinstance(post, dict):
+        return False
+    return "graphql" in (post.get("mimeType") or "").lower() or may_be_graphql_body(post.get("text"))
+
+
+def iter_har_entries(path: str) -> Iterator[Dict[str, Any]]:
+    if ijson is not None:
+        # Stream entries one at a time instead of materializing the whole HAR tree
+        with open(path, "rb") as f:
+            yield from ijson.items(f, "log.entries.item", use_float=True)
+        return
+    with open(path, "rb") as f:
+        data = json_loads(f.read())
+    yield from safe_get(data, "log", "entries", default=[]) or []
+
+
+def build_item(e: Dict[str, Any]) -> Dict[str, Any]:
+    req = e.get("request", {})
+    res = e.get("response", {})
+    method = req.get("method", "GET")
+    url = req.get("url", "")
+    url_no_q, domain, endpoint, query = normalize_url(url)
+    status = res.get("status")
+    time_ms = e.get("time")
+    req_headers = list_to_kv_map(req.get("headers"))
+    res_headers = list_to_kv_map(res.get("headers"))
+    # Resolve the nested containers once rather than walking them per field
+    post = req.get("postData")
+    if not isinstance(post, dict):
+        post = {}
+    content = res.get("content")
+    req_body_text = post.get("text")
+    res_body_text = content.get("text") if isinstance(content, dict) else None
+    started = e.get("startedDateTime")
+    mime = (post.get("mimeType") or "").lower()
+    # Parse the body at most once; the result drives both detection and the GraphQL fields
+    body_obj = None
+    if req_body_text and ("graphql" in mime or may_be_graphql_body(req_body_text)):
+        body_obj = parse_json_object(req_body_text)
+
+    is_gql = detect_graphql(mime, body_obj)
+    item: Dict[str, Any] = {
+        "type": "graphql" if is_gql else "rest",
+        "method": method,
+        "url": url,
+        "url_no_q": url_no_q,
+        "domain": domain,
+        "endpoint": endpoint,
+        "status": status,
+        "time": time_ms,
+        "req_headers": req_headers,
+        "res_headers": res_headers,
+        "req_body": req_body_text,
+        "res_body": res_body_text,
+        "started_at": started,
+    }
+    # parameters signature for REST (query + JSON body if applicable)
+    if not is_gql:
+        params_sig = query_params_signature(query)
+        json_body_sig = ""
+        if mime.startswith("application/json") and req_body_text:
+            json_body_sig = canonicalize_json_str(req_body_text)
+        item["param_signature"] = sig = JSON_ENCODE_SORTED({"query": params_sig, "json": json_body_sig})
+        # Pair by endpoint + method + parameter signature (query + json body signature if JSON)
+        item["_pair_key"] = (method, endpoint, sig)
+    else:
+        # GraphQL fields
+        gql_op = None
+        gql_query_raw = None
+        gql_vars = None
+        if body_obj is not None:
+            gql_op = body_obj.get("operationName")
+            gql_query_raw = body_obj.get("query")
+            gql_vars = body_obj.get("variables")
+        item["gql_operation"] = gql_op
+        item["gql_query"] = gql_query_raw
+        item["gql_query_norm"] = gql_query_norm = normalize_graphql_query(gql_query_raw)
+        item["gql_variables"] = gql_vars
+        # Pair by endpoint + method + operationName + normalized query; a fixed-size digest keeps keys small
+        qhash = hashlib.blake2b(gql_query_norm.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        item["_pair_key"] = (method, endpoint, gql_op or "", qhash)
+    return item
+
+
+def load_har(path: str, api_only: bool = False) -> List[Dict[str, Any]]:
+    entries = iter_har_entries(path)
+    if api_only:
+        # Drop page assets before any per-entry work is done on them
+        entries = filter(is_api_entry, entries)
+    return [build_item(e) for e in entries]
+
+
+def load_hars(paths: List[str], api_only: bool = False) -> List[List[Dict[str, Any]]]:
+    load = partial(load_har, api_only=api_only)
+    # Files parse independently, so spread them over processes when more than one core is available
+    workers = min(len(paths), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(load, paths))
+    return [load(p) for p in paths]
 
 
 # ----------------------------- SQLite storage -----------------------------
 
+# The database is written once per run and never read concurrently, so trade durability for load speed
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=OFF",
+    "temp_store=MEMORY",
+    "cache_size=-65536",
+    "locking_mode=EXCLUSIVE",
+)
+
+
 def init_db(db_path: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path)
+    # Autocommit mode; bulk loads open their own transactions explicitly
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    for p in SQLITE_PRAGMAS:
+        conn.execute("PRAGMA " + p)
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS runs(
@@ -212,70 +342,150 @@ def init_db(db_path: str) -> sqlite3.Connection:
 def insert_run(conn: sqlite3.Connection, label: str, file: str) -> int:
     cur = conn.cursor()
     cur.execute("INSERT INTO runs(label, file) VALUES (?, ?)", (label, file))
-    conn.commit()
     return cur.lastrowid
 
 
-def insert_requests(conn: sqlite3.Connection, run_id: int, entries: List[Dict[str, Any]]):
-    cur = conn.cursor()
-    for it in entries:
-        cur.execute(
-            """
-            INSERT INTO requests(
-                run_id, type, method, url, url_no_q, domain, endpoint, status, time_ms,
-                req_headers, res_headers, req_body, res_body, gql_operation, gql_query,
-                gql_query_norm, gql_variables, started_at
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """,
-            (
-                run_id, it.get("type"), it.get("method"), it.get("url"), it.get("url_no_q"), it.get("domain"), it.get("endpoint"),
-                it.get("status"), it.get("time"), json.dumps(it.get("req_headers")), json.dumps(it.get("res_headers")),
-                (it.get("req_body") or "").encode("utf-8"), (it.get("res_body") or "").encode("utf-8"),
-                it.get("gql_operation"), it.get("gql_query"), it.get("gql_query_norm"), json.dumps(it.get("gql_variables")),
-                it.get("started_at"),
-            ),
-        )
-    conn.commit()
-
-
-# ----------------------------- Comparators -----------------------------
+INSERT_REQUEST_PREFIX = """
+    INSERT INTO requests(
+        run_id, type, method, url, url_no_q, domain, endpoint, status, time_ms,
+        req_headers, res_headers, req_body, res_body, gql_operation, gql_query,
+        gql_query_norm, gql_variables, started_at
+    ) VALUES """
+REQUEST_COLUMNS = 18
+REQUEST_ROW_PLACEHOLDERS = "(" + ",".join("?" * REQUEST_COLUMNS) + ")"
+INSERT_REQUEST_SQL = INSERT_REQUEST_PREFIX + REQUEST_ROW_PLACEHOLDERS
+# Rows per multi-VALUES statement; larger statements stop paying off well before SQLite's limits
+INSERT_REQUEST_BATCH = 500
 
-class BaseComparator:
-    def key(self, e: Dict[str, Any]) -> str:
-        raise NotImplementedError
-
-    def name(self, e: Dict[str, Any]) -> str:
-        # default display name per request
-        return f"{e.get('method','')} {e.get('endpoint','')}"
 
+def request_rows_per_statement(conn: sqlite3.Connection) -> int:
+    try:
+        max_params = conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    except AttributeError:
+        # Connection.getlimit is Python 3.11+; SQLite raised its default from 999 to 32766 in 3.32
+        max_params = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+    return max(1, min(INSERT_REQUEST_BATCH, max_params // REQUEST_COLUMNS))
 
-class GraphQLComparator(BaseComparator):
-    def key(self, e: Dict[str, Any]) -> str:
-        # Pair by endpoint + method + operationName + normalized query
-        return f"{e.get('method')} {e.get('endpoint')} | op={e.get('gql_operation') or ''} | q={e.get('gql_query_norm') or ''}"
 
-    def name(self, e: Dict[str, Any]) -> str:
-        op = e.get("gql_operation") or ""
-        # Display bracketed name as requested
-        return f"[{op}] {e.get('method')} {e.get('endpoint')}" if op else f"{e.get('method')} {e.get('endpoint')}"
+def insert_requests(conn: sqlite3.Connection, run_id: int, entries: List[Dict[str, Any]]):
+    # Serialize everything up front, then load the whole run in one transaction
+    rows = [
+        (
+            run_id, it.get("type"), it.get("method"), it.get("url"), it.get("url_no_q"), it.get("domain"), it.get("endpoint"),
+            it.get("status"), it.get("time"),
+            json_dumps_compact(it.get("req_headers")), json_dumps_compact(it.get("res_headers")),
+            (it.get("req_body") or "").encode("utf-8"), (it.get("res_body") or "").encode("utf-8"),
+            it.get("gql_operation"), it.get("gql_query"), it.get("gql_query_norm"),
+            json_dumps_compact(it.get("gql_variables")),
+            it.get("started_at"),
+        )
+        for it in entries
+    ]
+    cur = conn.cursor()
+    # Join the caller's transaction when there is one (see main)
+    own_tx = not conn.in_transaction
+    if own_tx:
+        conn.execute("BEGIN")
+    # Full batches go in as multi-VALUES statements, which skips one sqlite3_step/reset per row;
+    # the remainder uses executemany so every batch statement has the same text and stays cached
+    per_stmt = request_rows_per_statement(conn)
+    full = len(rows) - len(rows) % per_stmt
+    if full:
+        batch_sql = INSERT_REQUEST_PREFIX + ",".join([REQUEST_ROW_PLACEHOLDERS] * per_stmt)
+        for i in range(0, full, per_stmt):
+            cur.execute(batch_sql, list(chain.from_iterable(rows[i:i + per_stmt])))
+    cur.executemany(INSERT_REQUEST_SQL, rows[full:])
+    if own_tx:
+        conn.execute("COMMIT")
+
+
+def finalize_indexes(conn: sqlite3.Connection):
+    # Secondary indexes are built once after the bulk load rather than maintained per inserted row
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_run_type ON requests(run_id, type)")
 
 
-class RestComparator(BaseComparator):
-    def key(self, e: Dict[str, Any]) -> str:
-        # Pair by endpoint + method + parameter signature (query + json body signature if JSON)
-        sig = e.get("param_signature") or ""
-        return f"{e.get('method')} {e.get('endpoint')} | p={sig}"
+# ----------------------------- Pairing and diff -----------------------------
 
+def dict_diff(old: Dict[str, str], new: Dict[str, str]) -> Dict[str, Any]:
+    # Paired requests usually carry identical headers; dict equality settles that in C
+    if old == new:
+        return {"added": {}, "removed": {}, "changed": {}}
+    # One pass over each side classifies every key without building intermediate key sets
+    removed, changed = {}, {}
+    for k, ov in old.items():
+        if k in new:
+            nv = new[k]
+            if ov != nv:
+                changed[k] = {"old": ov, "new": nv}
+        else:
+            removed[k] = ov
+    added = {k: v for k, v in new.items() if k not in old}
+    return {"added": added, "removed": removed, "changed": changed}
 
-# ----------------------------- Pairing and diff -----------------------------
 
-def pair_entries_by_type(a: List[Dict[str, Any]], b: List[Dict[str, Any]]):
-    gql_cmp = GraphQLComparator()
-    rest_cmp = RestComparator()
-    def group(items: List[Dict[str, Any]], cmp: BaseComparator):
-        d: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+def diff_pair(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    req_hdr = dict_diff(a.get("req_headers", {}), b.get("req_headers", {}))
+    res_hdr = dict_diff(a.get("res_headers", {}), b.get("res_headers", {}))
+    # GraphQL diffs; identical raw inputs normalize identically, so only normalize when they differ
+    qa_raw, qb_raw = a.get("gql_query"), b.get("gql_query")
+    if qa_raw == qb_raw:
+        gql_query_changed = False
+    else:
+        gql_query_changed = normalize_graphql_query(qa_raw) != normalize_graphql_query(qb_raw)
+    # Variables are parsed from the request body, so byte-identical bodies mean identical variables
+    va_raw, vb_raw = a.get("gql_variables"), b.get("gql_variables")
+    if va_raw is vb_raw or a.get("req_body") == b.get("req_body"):
+        gql_vars_changed = False
+    else:
+        gql_vars_changed = canonicalize_json_str(va_raw) != canonicalize_json_str(vb_raw)
+    op_a, op_b = a.get("gql_operation"), b.get("gql_operation")
+    status_changed = a.get("status") != b.get("status")
+    time_changed = None
+    try:
+        ta, tb = (a.get("time") or 0), (b.get("time") or 0)
+        time_changed = abs((tb or 0) - (ta or 0)) > 100
+    except Exception:
+        time_changed = False
+    headers_changed = any([req_hdr["added"], req_hdr["removed"], req_hdr["changed"], res_hdr["added"], res_hdr["removed"], res_hdr["changed"]])
+    any_changed = any([status_changed, time_changed, headers_changed, gql_query_changed, gql_vars_changed])
+    return {
+        "type": b.get("type") or a.get("type"),
+        "domain": b.get("domain") or a.get("domain"),
+        "method": b.get("method") or a.get("method"),
+        "endpoint": b.get("endpoint") or a.get("endpoint"),
+        "url": b.get("url") or a.get("url"),
+        "name": (f"[{op_b}] {b.get('method')} {b.get('endpoint')}" if op_b else f"{b.get('method')} {b.get('endpoint')}") if (b and b.get('type')=='graphql') else (f"[{op_a}] {a.get('method')} {a.get('endpoint')}" if a.get('type')=='graphql' and op_a else f"{a.get('method')} {a.get('endpoint')}"),
+        "status_a": a.get("status"),
+        "status_b": b.get("status"),
+        "time_a": a.get("time"),
+        "time_b": b.get("time"),
+        "req_hdr": req_hdr,
+        "res_hdr": res_hdr,
+        "gql": {
+            "op_a": op_a, "op_b": op_b,
+            "query_a": a.get("gql_query"),
+            "query_b": b.get("gql_query"),
+            "vars_a": a.get("gql_variables"),
+            "vars_b": b.get("gql_variables"),
+            "query_changed": gql_query_changed,
+            "vars_changed": gql_vars_changed,
+        },
+        "badges": {
+            "status": status_changed,
+            "time": time_changed,
+            "headers": headers_changed,
+            "gql_query": gql_query_changed,
+            "gql_vars": gql_vars_changed,
+        },
+        "any_changed": any_changed,
+    }
+
+
+def pair_and_diff(a: List[Dict[str, Any]], b: List[Dict[str, Any]]):
+    def group(items: List[Dict[str, Any]]):
+        d: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
         for it in items:
-            d[cmp.key(it)].append(it)
+            d[it["_pair_key"]].append(it)
         return d
 
     a_gql = [x for x in a if x["type"] == "graphql"]
@@ -283,88 +493,22 @@ def pair_entries_by_type(a: List[Dict[str, Any]], b: List[Dict[str, Any]]):
     a_rest = [x for x in a if x["type"] == "rest"]
     b_rest = [x for x in b if x["type"] == "rest"]
 
-    added, removed, pairs = [], [], []
-    for (a_items, b_items, cmp) in [ (a_gql, b_gql, gql_cmp), (a_rest, b_rest, rest_cmp) ]:
-        ga, gb = group(a_items, cmp), group(b_items, cmp)
+    # Matched pairs are diffed as soon as they are found rather than collected for a second pass
+    added, removed, rows = [], [], []
+    domains = set()
+    for (a_items, b_items) in [ (a_gql, b_gql), (a_rest, b_rest) ]:
+        ga, gb = group(a_items), group(b_items)
         keys = set(ga.keys()) | set(gb.keys())
         for k in keys:
             la, lb = ga.get(k, []), gb.get(k, [])
-            n = max(len(la), len(lb))
-            for i in range(n):
-                xa = la[i] if i < len(la) else None
-                xb = lb[i] if i < len(lb) else None
-                if xa and not xb:
-                    removed.append(xa)
-                elif xb and not xa:
-                    added.append(xb)
-                else:
-                    pairs.append((xa, xb))
-    return added, removed, pairs
-
-
-def dict_diff(old: Dict[str, str], new: Dict[str, str]) -> Dict[str, Any]:
-    ok, nk = set(old.keys()), set(new.keys())
-    added = {k: new[k] for k in nk - ok}
-    removed = {k: old[k] for k in ok - nk}
-    changed = {k: {"old": old[k], "new": new[k]} for k in ok & nk if old[k] != new[k]}
-    return {"added": added, "removed": removed, "changed": changed}
-
-
-def build_changed_rows(pairs: List[Tuple[Dict, Dict]]):
-    rows = []
-    domains = set()
-    for a, b in pairs:
-        domain = b.get("domain") or a.get("domain")
-        domains.add(domain)
-        req_hdr = dict_diff(a.get("req_headers", {}), b.get("req_headers", {}))
-        res_hdr = dict_diff(a.get("res_headers", {}), b.get("res_headers", {}))
-        # GraphQL diffs
-        aq, bq = normalize_graphql_query(a.get("gql_query")), normalize_graphql_query(b.get("gql_query"))
-        av, bv = canonicalize_json_str(a.get("gql_variables")), canonicalize_json_str(b.get("gql_variables"))
-        op_a, op_b = a.get("gql_operation"), b.get("gql_operation")
-        gql_query_changed = (aq != bq)
-        gql_vars_changed = (av != bv)
-        status_changed = a.get("status") != b.get("status")
-        time_changed = None
-        try:
-            ta, tb = (a.get("time") or 0), (b.get("time") or 0)
-            time_changed = abs((tb or 0) - (ta or 0)) > 100
-        except Exception:
-            time_changed = False
-        headers_changed = any([req_hdr["added"], req_hdr["removed"], req_hdr["changed"], res_hdr["added"], res_hdr["removed"], res_hdr["changed"]])
-        any_changed = any([status_changed, time_changed, headers_changed, gql_query_changed, gql_vars_changed])
-        rows.append({
-            "type": b.get("type") or a.get("type"),
-            "domain": domain,
-            "method": b.get("method") or a.get("method"),
-            "endpoint": b.get("endpoint") or a.get("endpoint"),
-            "url": b.get("url") or a.get("url"),
-            "name": (f"[{op_b}] {b.get('method')} {b.get('endpoint')}" if op_b else f"{b.get('method')} {b.get('endpoint')}") if (b and b.get('type')=='graphql') else (f"[{op_a}] {a.get('method')} {a.get('endpoint')}" if a.get('type')=='graphql' and op_a else f"{a.get('method')} {a.get('endpoint')}"),
-            "status_a": a.get("status"),
-            "status_b": b.get("status"),
-            "time_a": a.get("time"),
-            "time_b": b.get("time"),
-            "req_hdr": req_hdr,
-            "res_hdr": res_hdr,
-            "gql": {
-                "op_a": op_a, "op_b": op_b,
-                "query_a": a.get("gql_query"),
-                "query_b": b.get("gql_query"),
-                "vars_a": a.get("gql_variables"),
-                "vars_b": b.get("gql_variables"),
-                "query_changed": gql_query_changed,
-                "vars_changed": gql_vars_changed,
-            },
-            "badges": {
-                "status": status_changed,
-                "time": time_changed,
-                "headers": headers_changed,
-                "gql_query": gql_query_changed,
-                "gql_vars": gql_vars_changed,
-            },
-            "any_changed": any_changed,
-        })
-    return rows, sorted(domains)
+            # Entries pair up positionally; whichever side is longer contributes the leftovers
+            for xa, xb in zip(la, lb):
+                row = diff_pair(xa, xb)
+                domains.add(row["domain"])
+                rows.append(row)
+            removed.extend(la[len(lb):])
+            added.extend(lb[len(la):])
+    return added, removed, rows, sorted(domains)
 
 
 # ----------------------------- HTML rendering (light theme) -----------------------------
@@ -479,25 +623,58 @@ HTML_FOOT = """
 </body></html>
 """
 
+# Static CSS/JS are substituted once at import; the domain checkboxes are written between the two head halves
+REPORT_HEAD_START, _, REPORT_HEAD_END = HTML_HEAD.replace("__CSS__", CSS).partition("__DOMAIN_CHECKBOXES__")
+REPORT_FOOT = HTML_FOOT.replace("__JS__", JS)
+
+
+def render_header_table(headers: dict) -> str:
+    if not headers:
+        return '<div class="td" style="color:var(--muted)">None</div>'
+    # Entries from one capture share a few header sets, so tables are cached by their exact contents
+    return header_table_html(tuple(headers.items()))
+
+
+@lru_cache(maxsize=1024)
+def header_table_html(items: Tuple[Tuple[str, str], ...]) -> str:
+    return (
+        '<table class="header-table"><tr><th>Header</th><th>Value</th></tr>'
+        + "".join(f'<tr><td>{escape(k)}</td><td style="word-break:break-word">{escape(v)}</td></tr>' for k, v in items)
+        + '</table>'
+    )
+
 
 def render_header_diff(title: str, diff: Dict[str, Any]) -> str:
-    parts = [f'<div class="section-title">{html.escape(title)}</div>']
-    if diff["added"] or diff["removed"] or diff["changed"]:
-        parts.append('<table class="header-table">')
-        parts.append('<tr><th>Header</th><th>Old Value</th><th>New Value</th></tr>')
-        # Changed
-        for k, ch in diff["changed"].items():
-            parts.append(f'<tr><td>{html.escape(k)}</td><td style="background:#fee2e2">{html.escape(str(ch["old"]))}</td><td style="background:#dcfce7">{html.escape(str(ch["new"]))}</td></tr>')
-        # Added
-        for k, v in diff["added"].items():
-            parts.append(f'<tr><td>{html.escape(k)}</td><td></td><td style="background:#ecfdf5">{html.escape(v)}</td></tr>')
-        # Removed
-        for k, v in diff["removed"].items():
-            parts.append(f'<tr><td>{html.escape(k)}</td><td style="background:#fef2f2">{html.escape(v)}</td><td></td></tr>')
-        parts.append('</table>')
-    else:
-        parts.append('<div class="td" style="color:var(--muted)">No changes</div>')
-    return "".join(parts)
+    head = f'<div class="section-title">{escape(title)}</div>'
+    changed, added, removed = diff["changed"], diff["added"], diff["removed"]
+    if not (added or removed or changed):
+        return head + '<div class="td" style="color:var(--muted)">No changes</div>'
+    # Each section is joined once from a generator rather than appended row by row
+    return "".join((
+        head,
+        '<table class="header-table"><tr><th>Header</th><th>Old Value</th><th>New Value</th></tr>',
+        "".join(f'<tr><td>{escape(k)}</td><td style="background:#fee2e2">{escape(ch["old"])}</td><td style="background:#dcfce7">{escape(ch["new"])}</td></tr>' for k, ch in changed.items()),
+        "".join(f'<tr><td>{escape(k)}</td><td></td><td style="background:#ecfdf5">{escape(v)}</td></tr>' for k, v in added.items()),
+        "".join(f'<tr><td>{escape(k)}</td><td style="background:#fef2f2">{escape(v)}</td><td></td></tr>' for k, v in removed.items()),
+        '</table>',
+    ))
+
+
+SIDE_BY_SIDE_TEMPLATE = (
+    '<div class="section-title">{title} {badge}</div>'
+    '<div style="display:flex;gap:16px;flex-wrap:wrap">'
+    '<div style="flex:1;min-width:240px"><div style="color:var(--muted);font-size:12px">Before</div><{tag} class="code">{before}</{tag}></div>'
+    '<div style="flex:1;min-width:240px"><div style="color:var(--muted);font-size:12px">After</div><{tag} class="code">{after}</{tag}></div>'
+    '</div>'
+)
+
+
+def render_side_by_side(title: str, changed: Any, a: str, b: str, tag: str) -> str:
+    before = diff_text(a, b)
+    # Equal sides diff to the same markup in both directions, so the second diff is skipped
+    after = before if a == b else diff_text(b, a)
+    badge = '<span class="badge warn">changed</span>' if changed else ''
+    return SIDE_BY_SIDE_TEMPLATE.format(title=title, badge=badge, tag=tag, before=before, after=after)
 
 
 def render_graphql_details(gql: Dict[str, Any]) -> str:
@@ -505,37 +682,39 @@ def render_graphql_details(gql: Dict[str, Any]) -> str:
     op_a = gql.get("op_a")
     op_b = gql.get("op_b")
     if op_a or op_b:
-        left = html.escape(str(op_a or ""))
-        right = html.escape(str(op_b or ""))
+        left = escape(op_a or "")
+        right = escape(op_b or "")
         changed = ' <span class="badge warn">changed</span>' if left!=right else ''
         title = f'GraphQL Operation {changed}'
         parts.append(f'<div class="section-title">{title}</div>')
         parts.append(f'<div class="td">[{left}] → [{right}]</div>')
     if gql.get("query_a") or gql.get("query_b"):
-        q_changed = gql.get("query_changed")
-        change_badge = '<span class="badge warn">changed</span>' if q_changed else ''
         qa = str(gql.get("query_a") or "")
         qb = str(gql.get("query_b") or "")
-        parts.append(f'<div class="section-title">Query {change_badge}</div>')
-        parts.append('<div style="display:flex;gap:16px;flex-wrap:wrap">')
-        parts.append('<div style="flex:1;min-width:240px"><div style="color:var(--muted);font-size:12px">Before</div><div class="code">'+diff_text(qa, qb)+'</div></div>')
-        parts.append('<div style="flex:1;min-width:240px"><div style="color:var(--muted);font-size:12px">After</div><div class="code">'+diff_text(qb, qa)+'</div></div>')
-        parts.append('</div>')
+        parts.append(render_side_by_side("Query", gql.get("query_changed"), qa, qb, "div"))
     if gql.get("vars_a") is not None or gql.get("vars_b") is not None:
-        v_changed = gql.get("vars_changed")
-        vars_badge = '<span class="badge warn">changed</span>' if v_changed else ''
         va = json.dumps(gql.get("vars_a"), indent=2, ensure_ascii=False) if gql.get("vars_a") is not None else ''
         vb = json.dumps(gql.get("vars_b"), indent=2, ensure_ascii=False) if gql.get("vars_b") is not None else ''
-        parts.append(f'<div class="section-title">Variables {vars_badge}</div>')
-        parts.append('<div style="display:flex;gap:16px;flex-wrap:wrap">')
-        parts.append('<div style="flex:1;min-width:240px"><div style="color:var(--muted);font-size:12px">Before</div><pre class="code">'+diff_text(va, vb)+'</pre></div>')
-        parts.append('<div style="flex:1;min-width:240px"><div style="color:var(--muted);font-size:12px">After</div><pre class="code">'+diff_text(vb, va)+'</pre></div>')
-        parts.append('</div>')
+        parts.append(render_side_by_side("Variables", gql.get("vars_changed"), va, vb, "pre"))
     return "".join(parts)
 
 
 def escape(s: Any) -> str:
-    return html.escape(str(s))
+    s = str(s)
+    # Most values contain nothing to escape, and substring checks are far cheaper than rewriting the string
+    if "&" in s or "<" in s or ">" in s or '"' in s or "'" in s:
+        return html.escape(s)
+    return s
+
+EMPTY_ATTR_JSON = "{}"
+
+
+def attr_json(obj: Any) -> str:
+    # Header maps embedded in data-* attributes for the client-side filter
+    if not obj:
+        return EMPTY_ATTR_JSON
+    return escape(json_dumps_compact(obj))
+
 
 def diff_text(a: str, b: str) -> str:
     """Return HTML with word-level diff highlighting between a and b."""
@@ -543,6 +722,9 @@ def diff_text(a: str, b: str) -> str:
     if b is None: b = ""
     a_lines = a.splitlines()
     b_lines = b.splitlines()
+    if a == b:
+        # Equal inputs diff to a single 'equal' run, so skip the matcher and render it directly
+        return '\n'.join(map(escape, a_lines)) if len(a_lines) > 1 else escape(a)
     # If multiline, do line diff; else, do word diff
     if len(a_lines) > 1 or len(b_lines) > 1:
         sm = difflib.SequenceMatcher(None, a_lines, b_lines)
@@ -550,18 +732,18 @@ def diff_text(a: str, b: str) -> str:
         for tag, i1, i2, j1, j2 in sm.get_opcodes():
             if tag == 'equal':
                 for line in a_lines[i1:i2]:
-                    out.append(html.escape(line))
+                    out.append(escape(line))
             elif tag == 'replace':
                 for line in a_lines[i1:i2]:
-                    out.append('<span class="diff old">'+html.escape(line)+'</span>')
+                    out.append('<span class="diff old">'+escape(line)+'</span>')
                 for line in b_lines[j1:j2]:
-                    out.append('<span class="diff new">'+html.escape(line)+'</span>')
+                    out.append('<span class="diff new">'+escape(line)+'</span>')
             elif tag == 'delete':
                 for line in a_lines[i1:i2]:
-                    out.append('<span class="diff old">'+html.escape(line)+'</span>')
+                    out.append('<span class="diff old">'+escape(line)+'</span>')
             elif tag == 'insert':
                 for line in b_lines[j1:j2]:
-                    out.append('<span class="diff new">'+html.escape(line)+'</span>')
+                    out.append('<span class="diff new">'+escape(line)+'</span>')
         return '\n'.join(out)
     else:
         # word-level diff
@@ -569,132 +751,122 @@ def diff_text(a: str, b: str) -> str:
         out = []
         for tag, i1, i2, j1, j2 in sm.get_opcodes():
             if tag == 'equal':
-                out.append(html.escape(a[i1:i2]))
+                out.append(escape(a[i1:i2]))
             elif tag == 'replace':
                 if i1 != i2:
-                    out.append('<span class="diff old">'+html.escape(a[i1:i2])+'</span>')
+                    out.append('<span class="diff old">'+escape(a[i1:i2])+'</span>')
                 if j1 != j2:
-                    out.append('<span class="diff new">'+html.escape(b[j1:j2])+'</span>')
+                    out.append('<span class="diff new">'+escape(b[j1:j2])+'</span>')
             elif tag == 'delete':
-                out.append('<span class="diff old">'+html.escape(a[i1:i2])+'</span>')
+                out.append('<span class="diff old">'+escape(a[i1:i2])+'</span>')
             elif tag == 'insert':
-                out.append('<span class="diff new">'+html.escape(b[j1:j2])+'</span>')
+                out.append('<span class="diff new">'+escape(b[j1:j2])+'</span>')
         return ''.join(out)
 
 
-def generate_html(added: List[Dict], removed: List[Dict], changed_rows: List[Dict], domains: List[str]) -> str:
-    css = CSS
-    domain_checks = [f'<label><input type="checkbox" class="domain-checkbox" value="{escape(d)}" checked onchange="onFilterChanged()"> {escape(d)}</label>' for d in domains]
-    head = HTML_HEAD.replace("__CSS__", css).replace("__DOMAIN_CHECKBOXES__", "".join(domain_checks))
-
-    def row_badges(b):
-        parts = []
-        if b.get("status"): parts.append('<span class="badge warn">status</span>')
-        if b.get("time"): parts.append('<span class="badge warn">time</span>')
-        if b.get("headers"): parts.append('<span class="badge warn">headers</span>')
-        if b.get("gql_query"): parts.append('<span class="badge warn">gql:query</span>')
-        if b.get("gql_vars"): parts.append('<span class="badge warn">gql:variables</span>')
-        return "".join(parts) or '<span class="badge">no-change</span>'
-
-    # Added/Removed Panel
-    html_added = ['<div id="panel-added" class="panel" style="display:block">']
-    # New Requests section
-    html_added.append('<h3 class="section-title">New Requests</h3>')
-    html_added.append('<table class="table">')
-    for i,x in enumerate(added):
-        rid = f"add-{i}"
-        if x.get('type') == 'graphql' and x.get('gql_operation'):
-            display_name = f"[{escape(x.get('gql_operation'))}] {escape(x['method'])} {escape(x['endpoint'])}"
-        else:
-            display_name = f"{escape(x['method'])} {escape(x['endpoint'])}"
-        html_added.append('<tr class="tr expand" data-row="req" onclick="toggleDetails(\'%s\')" data-detail-id="%s" data-domain="%s" data-name="%s" data-req-headers="%s" data-res-headers="%s">'%(
-            rid, rid, escape(x['domain']), display_name,
-            html.escape(json.dumps(x.get('req_headers') or {})),
-            html.escape(json.dumps(x.get('res_headers') or {}))
-        ))
-        html_added.append('<td class="td">%s</td>'%escape(x['method']))
-        html_added.append('<td class="td"><span class="url">%s</span><div style="color:var(--muted);font-size:12px">%s</div></td>'%(escape(x['url']), display_name))
-        html_added.append('<td class="td"><span class="badge good">added</span></td>')
-        html_added.append('</tr>')
-        # details row
-        html_added.append('<tr id="%s" class="details"><td class="td" colspan="3">'%rid)
-        # show headers and GraphQL content if present
-        html_added.append('<div class="section-title">Request Headers</div>')
-        html_added.append(render_header_table(x.get('req_headers') or {}))
-        html_added.append('<div class="section-title">Response Headers</div>')
-        html_added.append(render_header_table(x.get('res_headers') or {}))
-        if x.get('type')=='graphql':
-            html_added.append(render_graphql_details({
-                'op_a': None,'op_b': x.get('gql_operation'),
-                'query_a': None,'query_b': x.get('gql_query'),
-                'vars_a': None,'vars_b': x.get('gql_variables'),
-                'query_changed': True if x.get('gql_query') else False,
-                'vars_changed': True if x.get('gql_variables') else False,
-            }))
-        html_added.append('</td></tr>')
-    html_added.append('</table>')
-
-    # Missing Requests section
-    html_added.append('<h3 class="section-title">Missing Requests</h3>')
-    html_added.append('<table class="table">')
-    for i,x in enumerate(removed):
-        rid = f"rem-{i}"
+ENTRY_ROW_TEMPLATE = (
+    '<tr class="tr expand" data-row="req" onclick="toggleDetails(\'{rid}\')" data-detail-id="{rid}" data-domain="{domain}" data-name="{name}" data-req-headers="{req_headers}" data-res-headers="{res_headers}">'
+    '<td class="td">{method}</td>'
+    '<td class="td"><span class="url">{url}</span><div style="color:var(--muted);font-size:12px">{name}</div></td>'
+    '<td class="td">{badge}</td>'
+    '</tr>'
+    '<tr id="{rid}" class="details"><td class="td" colspan="3">'
+    '<div class="section-title">Request Headers</div>{req_table}'
+    '<div class="section-title">Response Headers</div>{res_table}'
+    '{gql}'
+    '</td></tr>'
+)
+
+CHANGED_ROW_TEMPLATE = (
+    '<tr class="tr expand" onclick="toggleDetails(\'{rid}\')" data-row="req" data-detail-id="{rid}" data-domain="{domain}" data-name="{name}" data-req-headers="{req_headers}" data-res-headers="{res_headers}">'
+    '<td class="td">{method}</td>'
+    '<td class="td"><span class="url">{url}</span><div style="color:var(--muted);font-size:12px">{name}</div></td>'
+    '<td class="td">{status}</td>'
+    '<td class="td">{time}</td>'
+    '<td class="td">{badges}</td>'
+    '</tr>'
+    '<tr id="{rid}" class="details"><td class="td" colspan="5">'
+    '{req_diff}{res_diff}{gql}'
+    '</td></tr>'
+)
+
+
+# Only 32 badge combinations exist, so each is rendered once
+@lru_cache(maxsize=32)
+def row_badges(status: bool, time_changed: bool, headers: bool, gql_query: bool, gql_vars: bool) -> str:
+    parts = []
+    if status: parts.append('<span class="badge warn">status</span>')
+    if time_changed: parts.append('<span class="badge warn">time</span>')
+    if headers: parts.append('<span class="badge warn">headers</span>')
+    if gql_query: parts.append('<span class="badge warn">gql:query</span>')
+    if gql_vars: parts.append('<span class="badge warn">gql:variables</span>')
+    return "".join(parts) or '<span class="badge">no-change</span>'
+
+
+def write_html(out: TextIO, added: List[Dict], removed: List[Dict], changed_rows: List[Dict], domains: List[str]) -> None:
+    esc = escape
+
+    def entry_row(rid: str, x: Dict, badge: str, side: str) -> str:
         if x.get('type') == 'graphql' and x.get('gql_operation'):
-            display_name = f"[{escape(x.get('gql_operation'))}] {escape(x['method'])} {escape(x['endpoint'])}"
+            display_name = f"[{esc(x.get('gql_operation'))}] {esc(x['method'])} {esc(x['endpoint'])}"
         else:
-            display_name = f"{escape(x['method'])} {escape(x['endpoint'])}"
-        html_added.append('<tr class="tr expand" data-row="req" onclick="toggleDetails(\'%s\')" data-detail-id="%s" data-domain="%s" data-name="%s" data-req-headers="%s" data-res-headers="%s">'%(
-            rid, rid, escape(x['domain']), display_name,
-            html.escape(json.dumps(x.get('req_headers') or {})),
-            html.escape(json.dumps(x.get('res_headers') or {}))
-        ))
-        html_added.append('<td class="td">%s</td>'%escape(x['method']))
-        html_added.append('<td class="td"><span class="url">%s</span><div style="color:var(--muted);font-size:12px">%s</div></td>'%(escape(x['url']), display_name))
-        html_added.append('<td class="td"><span class="badge bad">removed</span></td>')
-        html_added.append('</tr>')
-        html_added.append('<tr id="%s" class="details"><td class="td" colspan="3">'%rid)
-        html_added.append('<div class="section-title">Request Headers</div>')
-        html_added.append(render_header_table(x.get('req_headers') or {}))
-        html_added.append('<div class="section-title">Response Headers</div>')
-        html_added.append(render_header_table(x.get('res_headers') or {}))
-        if x.get('type')=='graphql':
-            html_added.append(render_graphql_details({
-                'op_a': x.get('gql_operation'),'op_b': None,
-                'query_a': x.get('gql_query'),'query_b': None,
-                'vars_a': x.get('gql_variables'),'vars_b': None,
+            display_name = f"{esc(x['method'])} {esc(x['endpoint'])}"
+        gql = ''
+        if x.get('type') == 'graphql':
+            # An added entry only has an "after" side, a removed one only a "before" side
+            other = 'a' if side == 'b' else 'b'
+            gql = render_graphql_details({
+                'op_'+side: x.get('gql_operation'), 'op_'+other: None,
+                'query_'+side: x.get('gql_query'), 'query_'+other: None,
+                'vars_'+side: x.get('gql_variables'), 'vars_'+other: None,
                 'query_changed': True if x.get('gql_query') else False,
                 'vars_changed': True if x.get('gql_variables') else False,
-            }))
-        html_added.append('</td></tr>')
-    html_added.append('</table></div>')
+            })
+        return ENTRY_ROW_TEMPLATE.format(
+            rid=rid, domain=esc(x['domain']), name=display_name, method=esc(x['method']), url=esc(x['url']),
+            req_headers=attr_json(x.get('req_headers')),
+            res_headers=attr_json(x.get('res_headers')),
+            badge=badge,
+            req_table=render_header_table(x.get('req_headers') or {}),
+            res_table=render_header_table(x.get('res_headers') or {}),
+            gql=gql,
+        )
+
+    def changed_row(rid: str, row: Dict) -> str:
+        b = row['badges']
+        status_val = f"<span class='diff'><span class='old'>{esc(row['status_a'])}</span> → <span class='new'>{esc(row['status_b'])}</span></span>" if b['status'] else esc(row.get('status_b'))
+        time_val = f"<span class='diff'><span class='old'>{esc(row['time_a'])}ms</span> → <span class='new'>{esc(row['time_b'])}ms</span></span>" if b['time'] else f"{esc(row.get('time_b'))}ms"
+        name = esc(row.get('name') or '')
+        return CHANGED_ROW_TEMPLATE.format(
+            rid=rid, domain=esc(row['domain']), name=name, method=esc(row['method']), url=esc(row['url']),
+            req_headers=attr_json(row.get('req_hdr',{}).get('old',{})),
+            res_headers=attr_json(row.get('res_hdr',{}).get('old',{})),
+            status=status_val, time=time_val, badges=row_badges(bool(b['status']), bool(b['time']), bool(b['headers']), bool(b['gql_query']), bool(b['gql_vars'])),
+            req_diff=render_header_diff("Request Headers", row['req_hdr']),
+            res_diff=render_header_diff("Response Headers", row['res_hdr']),
+            gql=render_graphql_details(row['gql']),
+        )
+
+    # Fragments go straight to the output file, so the report is never held in memory as one string
+    write = out.write
+    write(REPORT_HEAD_START)
+    out.writelines(f'<label><input type="checkbox" class="domain-checkbox" value="{esc(d)}" checked onchange="onFilterChanged()"> {esc(d)}</label>' for d in domains)
+    write(REPORT_HEAD_END)
+
+    # Added/Removed Panel: New Requests, then Missing Requests
+    write('<div id="panel-added" class="panel" style="display:block">'
+          '<h3 class="section-title">New Requests</h3><table class="table">')
+    out.writelines(entry_row(f"add-{i}", x, '<span class="badge good">added</span>', 'b') for i, x in enumerate(added))
+    write('</table><h3 class="section-title">Missing Requests</h3><table class="table">')
+    out.writelines(entry_row(f"rem-{i}", x, '<span class="badge bad">removed</span>', 'a') for i, x in enumerate(removed))
+    write('</table></div>')
 
     # Changed Panel
-    html_changed = ['<div id="panel-changed" class="panel" style="display:none">']
-    html_changed.append('<table class="table">')
-    for i,row in enumerate(changed_rows):
-        rid = f"chg-{i}"
-        status_val = f"<span class='diff'><span class='old'>{escape(row['status_a'])}</span> → <span class='new'>{escape(row['status_b'])}</span></span>" if row['badges']['status'] else escape(row.get('status_b'))
-        time_val = f"<span class='diff'><span class='old'>{escape(row['time_a'])}ms</span> → <span class='new'>{escape(row['time_b'])}ms</span></span>" if row['badges']['time'] else f"{escape(row.get('time_b'))}ms"
-        name = escape(row.get('name') or '')
-        html_changed.append('<tr class="tr expand" onclick="toggleDetails(\'%s\')" data-row="req" data-detail-id="%s" data-domain="%s" data-name="%s" data-req-headers="%s" data-res-headers="%s">'%(
-            rid, rid, escape(row['domain']), name,
-            html.escape(json.dumps(row.get('req_hdr',{}).get('old',{}) or {})),
-            html.escape(json.dumps(row.get('res_hdr',{}).get('old',{}) or {}))
-        ))
-        html_changed.append('<td class="td">%s</td>'%escape(row['method']))
-        html_changed.append('<td class="td"><span class="url">%s</span><div style="color:var(--muted);font-size:12px">%s</div></td>'%(escape(row['url']), name))
-        html_changed.append('<td class="td">%s</td>'%status_val)
-        html_changed.append('<td class="td">%s</td>'%time_val)
-        html_changed.append('<td class="td">%s</td>'%row_badges(row['badges']))
-        html_changed.append('</tr>')
-        html_changed.append('<tr id="%s" class="details"><td class="td" colspan="5">'%rid)
-        html_changed.append(render_header_diff("Request Headers", row['req_hdr']))
-        html_changed.append(render_header_diff("Response Headers", row['res_hdr']))
-        html_changed.append(render_graphql_details(row['gql']))
-        html_changed.append('</td></tr>')
-    html_changed.append('</table></div>')
-
-    return head + "".join(html_added+html_changed) + HTML_FOOT.replace("__JS__", JS)
+    write('<div id="panel-changed" class="panel" style="display:none"><table class="table">')
+    out.writelines(changed_row(f"chg-{i}", row) for i, row in enumerate(changed_rows))
+    write('</table></div>')
+
+    write(REPORT_FOOT)
 
 
 # ----------------------------- Main -----------------------------
@@ -705,25 +877,31 @@ def main():
     ap.add_argument('har_b', help='New/comparison HAR file')
     ap.add_argument('-o','--output', default='compare_advanced.html', help='Output HTML file')
     ap.add_argument('--db', default='har_compare.db', help='SQLite database file to store requests')
+    ap.add_argument('--api-only', action='store_true', help='Only load API/GraphQL requests, skipping page assets')
     args = ap.parse_args()
 
-    a = load_har(args.har_a)
-    b = load_har(args.har_b)
+    a, b = load_hars([args.har_a, args.har_b], api_only=args.api_only)
 
     # Save to SQLite
     conn = init_db(args.db)
+    conn.execute("BEGIN")
     run_a = insert_run(conn, 'old', os.path.abspath(args.har_a))
     insert_requests(conn, run_a, a)
     run_b = insert_run(conn, 'new', os.path.abspath(args.har_b))
     insert_requests(conn, run_b, b)
+    finalize_indexes(conn)
+    conn.execute("COMMIT")
     conn.close()
 
-    added, removed, pairs = pair_entries_by_type(a, b)
-    changed_rows, domains = build_changed_rows(pairs)
+    added, removed, changed_rows, domains = pair_and_diff(a, b)
 
-    html_out = generate_html(added, removed, changed_rows, domains)
-    with open(args.output, 'w', encoding='utf-8') as f:
-        f.write(html_out)
+    if args.output.endswith('.gz'):
+        # Level 1 keeps compression well ahead of the render loop
+        out = gzip.open(args.output, 'wt', encoding='utf-8', compresslevel=1)
+    else:
+        out = open(args.output, 'w', encoding='utf-8', buffering=1 << 20)
+    with out as f:
+        write_html(f, added, removed, changed_rows, domains)
     print(f"Report written to {args.output}")
 
 